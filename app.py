@@ -1,11 +1,42 @@
 import streamlit as st
 import pandas as pd
-from geopy.geocoders import Nominatim
+import numpy as np
 import google.generativeai as genai
 import requests
-import time
+from requests.adapters import HTTPAdapter
+import io
 import re
+import time
+import threading
+import shelve
+import zipfile
+import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from joblib import Memory
+from duckduckgo_search import DDGS
+from selectolax.parser import HTMLParser
+
+# One pooled session for every HTTP call: keep-alive connections avoid a fresh
+# TCP+TLS handshake per row, and the pool is sized for the worker threads.
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+# Compiled once at import — these run on every row / link parse
+_RE_AT = re.compile(r'@([-.\d]+),([-.\d]+)')
+_RE_3D4D = re.compile(r'!3d([-.\d]+)!4d([-.\d]+)')
+# Noise suffixes and stray dashes in one alternation — both are replaced with a
+# space and the trailing split/join collapses the leftovers
+_RE_NOISE = re.compile(r'\b(?:CHSL|CHS|Society|Phase \d+|Wing [A-Z]|Maintenance|Limited|Ltd|Pune)\b|[-–—]', re.IGNORECASE)
+_RE_JSON_ARR = re.compile(r'\[.*\]', re.DOTALL)
+
+# Societies per Gemini request — amortizes the per-call latency and prompt overhead
+GEMINI_BATCH_SIZE = 16
+
+# Rows per rendered table — caps Arrow serialization for both the live preview
+# and the paginated final view
+PAGE_SIZE = 50
 
 # --- APP SETUP ---
 st.set_page_config(page_title="Real Estate Market Intelligence", layout="wide")
@@ -21,15 +52,19 @@ def extract_coords_from_url(url):
     """Extracts Lat/Long from a Google Maps Link (Shortened or Full)."""
     try:
         if any(x in url for x in ["goo.gl", "google", "maps.app.goo.gl"]):
-            r = requests.get(url, allow_redirects=True, timeout=10)
+            # HEAD follows the redirect chain without downloading the maps page
+            r = SESSION.head(url, allow_redirects=True, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+            if r.status_code == 405:
+                r = SESSION.get(url, allow_redirects=True, stream=True, timeout=10)
+                r.close()
             url = r.url
         
         # Regex for @lat,long
-        match = re.search(r'@([-.\d]+),([-.\d]+)', url)
+        match = _RE_AT.search(url)
         if match: return float(match.group(1)), float(match.group(2))
-        
+
         # Regex for !3d...!4d...
-        match_alt = re.search(r'!3d([-.\d]+)!4d([-.\d]+)', url)
+        match_alt = _RE_3D4D.search(url)
         if match_alt: return float(match_alt.group(1)), float(match_alt.group(2))
     except Exception as e:
         st.error(f"Error parsing link: {e}")
@@ -37,81 +72,232 @@ def extract_coords_from_url(url):
 
 def clean_society_name(name):
     """Removes noise like 'A1- Maintenance', 'CHSL', 'C Wing' to improve search hits."""
-    # Pattern to remove common Pune/Excel suffixes
-    noise = r'\b(CHSL|CHS|Society|Phase \d+|Wing [A-Z]|Maintenance|Limited|Ltd|Pune)\b'
-    cleaned = re.sub(noise, '', str(name), flags=re.IGNORECASE)
-    # Remove extra dashes or special characters often found in your file
-    cleaned = re.sub(r'[-–—]', ' ', cleaned)
+    # Single pass removes common Pune/Excel suffixes and stray dashes alike
+    cleaned = _RE_NOISE.sub(' ', str(name))
     return ' '.join(cleaned.split()).strip()
 
-def get_coordinates(society, locality, city="Pune"):
-    """Finds coordinates using iterative search (Full -> Cleaned -> Locality)."""
-    geolocator = Nominatim(user_agent="pune_real_estate_ai_v7")
+@st.cache_data
+def load_df(file_bytes, name):
+    """Parses the uploaded CSV/XLSX once — cached on content across Streamlit reruns."""
+    if name.endswith('.csv'):
+        return pd.read_csv(io.BytesIO(file_bytes))
+    # calamine (Rust) parses XLSX several times faster than the default openpyxl
+    return pd.read_excel(io.BytesIO(file_bytes), engine='calamine')
+
+# Nominatim goes through the pooled Session like everything else; the lock +
+# timestamp hold all worker threads to the service's 1 req/s policy.
+_nominatim_lock = threading.Lock()
+_nominatim_last = [0.0]
+
+def nominatim_geocode(q):
+    """Raw Nominatim /search call on the shared Session, throttled to 1 req/s."""
+    with _nominatim_lock:
+        wait = 1.1 - (time.monotonic() - _nominatim_last[0])
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            r = SESSION.get('https://nominatim.openstreetmap.org/search',
+                            params={'q': q, 'format': 'jsonv2', 'limit': 1},
+                            headers={'User-Agent': 'pune_real_estate_ai_v7'}, timeout=10).json()
+        except:
+            r = None
+        _nominatim_last[0] = time.monotonic()
+    # Non-success paths also return JSON (error objects, 429/503 bodies) — only
+    # trust a non-empty result list, and swallow malformed entries like the
+    # geopy path used to
+    try:
+        if isinstance(r, list) and r:
+            return (float(r[0]['lat']), float(r[0]['lon']))
+    except:
+        pass
+    return None
+
+# Coordinates barely change, so cache hits on disk: re-uploads and duplicate
+# societies skip Nominatim (and its 1 req/s wait) entirely. Only successful
+# lookups are stored — _locate raises on a miss, and joblib doesn't cache
+# raising calls, so a transient outage can't poison the cache.
+_geo_memory = Memory('.geocache', verbose=0)
+
+def photon_geocode(q):
+    """Geocodes via Photon — OSM-backed, no hard 1 req/s limit, so no waiting."""
+    try:
+        r = SESSION.get('https://photon.komoot.io/api/', params={'q': q, 'limit': 1}, timeout=5).json()
+        feats = r.get('features')
+        if feats:
+            lon, lat = feats[0]['geometry']['coordinates']
+            return (lat, lon)
+    except:
+        pass
+    return None
+
+@_geo_memory.cache
+def _locate(society, locality, city):
+    """Iterative search (Full -> Cleaned -> Locality); raises LookupError on a miss.
+
+    Two tiers: Photon first (fast, unthrottled), then rate-limited Nominatim
+    only when every Photon variant misses.
+    """
     clean_soc = clean_society_name(society)
-    
+
     # Try 3 different combinations to ensure we don't get "Location Not Found"
     search_queries = [
-        f"{society}, {locality}, {city}", 
+        f"{society}, {locality}, {city}",
         f"{clean_soc}, {locality}, {city}",
         f"{locality}, {city}" # Fallback to Locality center
     ]
-    
+
+    for q in search_queries:
+        coords = photon_geocode(q)
+        if coords: return coords
+
     for q in search_queries:
+        coords = nominatim_geocode(q)
+        if coords: return coords
+    raise LookupError(f"no geocode match for {society!r}")
+
+def get_coordinates(society, locality, city="Pune"):
+    """Finds coordinates for a society, or None — misses are retried next run."""
+    try:
+        return _locate(society, locality, city)
+    except LookupError:
+        return None
+
+def process_key(key, need_snippets=True):
+    """Geocode (+ web search, unless the Gemini answer is already cached) for one
+    unique (society, locality, city) — runs on a worker thread."""
+    soc, loc, city = key
+    coords = get_coordinates(soc, loc, city)
+    snippets = ""
+    if need_snippets:
+        snippets = fetch_search_snippets(f"{soc} {loc} {city} price configurations 1bhk 2bhk 3bhk 4bhk 5bhk")
+    return key, coords, snippets
+
+# Typical road/great-circle ratio for Pune localities — good enough for ranking
+ROAD_MULTIPLIER = 1.3
+
+def haversine_km(lat1, lon1, lats, lons):
+    """Vectorized great-circle distance (km) from one point to arrays of points."""
+    R = 6371.0
+    dlat = np.radians(lats - lat1)
+    dlon = np.radians(lons - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lats)) * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(a))
+
+def estimate_road_distances(origin, dests):
+    """Estimates road distances as great-circle x multiplier — one NumPy op, zero HTTP."""
+    dists = [None] * len(dests)
+    idx = [i for i, d in enumerate(dests) if d]
+    if idx:
+        lats = np.array([dests[i][0] for i in idx])
+        lons = np.array([dests[i][1] for i in idx])
+        est = haversine_km(origin[0], origin[1], lats, lons) * ROAD_MULTIPLIER
+        for i, d in zip(idx, est):
+            dists[i] = round(float(d), 2)
+    return dists
+
+def get_osrm_table(origin, dests):
+    """Calculates driving distances to many destinations in one OSRM /table call."""
+    dists = [None] * len(dests)
+    valid = [(i, d) for i, d in enumerate(dests) if d]
+    # OSRM caps coordinates per request, so chunk destinations into batches of 100
+    for start in range(0, len(valid), 100):
+        chunk = valid[start:start + 100]
+        coords = ";".join(f"{lon},{lat}" for (lat, lon) in [origin] + [d for _, d in chunk])
+        url = f"http://router.project-osrm.org/table/v1/driving/{coords}?sources=0&annotations=distance"
         try:
-            loc = geolocator.geocode(q, timeout=10)
-            if loc: return (loc.latitude, loc.longitude)
-        except: continue
-        time.sleep(1.2) # Required for free usage
-    return None
+            data = SESSION.get(url, timeout=10).json()
+            if data['code'] == 'Ok':
+                # Row 0 = distances from the project to every destination (index 0 is the project itself)
+                for (i, _), meters in zip(chunk, data['distances'][0][1:]):
+                    if meters is not None:
+                        dists[i] = round(meters / 1000, 2)
+        except:
+            continue
+    return dists
+
+# Snippets are stable enough to reuse across runs; like the geocode cache,
+# failures raise and therefore never land on disk
+_snippet_memory = Memory('.snippet_cache', verbose=0)
 
-def get_car_distance(origin, dest):
-    """Calculates driving distance via OSRM Car Routing API."""
+@_snippet_memory.cache
+def _search_snippets(query):
+    """Fetches DuckDuckGo result snippets — structured API first, HTML scrape as
+    fallback; raises LookupError when neither path produced anything."""
     try:
-        # Format: lon,lat;lon,lat
-        url = f"http://router.project-osrm.org/route/v1/driving/{origin[1]},{origin[0]};{dest[1]},{dest[0]}?overview=false"
-        data = requests.get(url, timeout=10).json()
-        if data['code'] == 'Ok':
-            dist_km = data['routes'][0]['distance'] / 1000
-            return round(dist_km, 2)
+        with DDGS() as ddgs:
+            snippets = "\n".join(r.get('body', '') for r in ddgs.text(query, max_results=10))
+        if snippets:
+            return snippets
     except:
-        return "N/A"
-    return "N/A"
-
-def fetch_market_ai(society, locality, city, gemini_key):
-    """Uses Gemini AI to find Price and 1-5 BHK configurations from web search snippets."""
-    genai.configure(api_key=gemini_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    search_query = f"{society} {locality} {city} price configurations 1bhk 2bhk 3bhk 4bhk 5bhk"
-    
+        pass
+    # Fallback: the old HTML endpoint, parsed down to the result snippets so
+    # downstream consumers never see the surrounding tag soup
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        # Search DuckDuckGo (Free/No Key)
-        res = requests.get(f"https://html.duckduckgo.com/html/?q={search_query}", headers=headers, timeout=10)
-        snippet = res.text[:7000] # Provide context to Gemini
-        
-        prompt = f"""
-        Analyze the search results for the society '{society}' in '{locality}, {city}'.
-        Identify:
-        1. Every available BHK configuration (strictly from 1 to 5 BHK).
-        2. The 'Ticket Size' (Current market price/range in Cr or Lakhs).
-        
-        Search Context: {snippet}
-        
-        Output ONLY in this JSON format:
-        {{"bhk": "1, 2, 3 BHK", "price": "₹85 L - 1.5 Cr"}}
-        If no price is found, use 'Market Rates'.
-        """
-        
-        response = model.generate_content(prompt)
-        # Clean JSON from markdown if Gemini adds it
-        json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-        if json_match:
-            data = json.loads(json_match.group())
-            return data.get('price', 'N/A'), data.get('bhk', 'N/A')
+        # Only the first ~16 KB contains the top snippets — don't pull the full page
+        headers = {'User-Agent': 'Mozilla/5.0', 'Range': 'bytes=0-16383'}
+        res = SESSION.get(f"https://html.duckduckgo.com/html/?q={query}", headers=headers, stream=True, timeout=10)
+        head = res.raw.read(16384, decode_content=True).decode('utf-8', 'ignore')
+        res.close()
+        snippets = " ".join(n.text() for n in HTMLParser(head).css('a.result__snippet, .result__snippet'))
+        if snippets or head:
+            return snippets if snippets else head[:7000]
     except:
         pass
-    return "Market Rates", "1, 2, 3 BHK"
+    raise LookupError(f"no search snippets for {query!r}")
+
+def fetch_search_snippets(query):
+    """Returns cached-or-fresh search snippets for a query, or '' on a dry miss."""
+    try:
+        return _search_snippets(query)
+    except LookupError:
+        return ""
+
+@st.cache_resource
+def get_model(api_key):
+    """Configured Gemini model handle — built once per API key, not per call."""
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+def fetch_market_ai_batch(batch, snippets, gemini_key):
+    """Uses one Gemini call to find Price and 1-5 BHK configurations for a whole batch.
+
+    `batch` is a list of (society, locality, city) and `snippets` the matching
+    search context per society; returns a list of (price, bhk) in the same order.
+    """
+    model = get_model(gemini_key)
+
+    entries = "\n\n".join(
+        f"{idx+1}. Society: '{soc}' in '{loc}, {city}'\n   Search Context: {snip[:600]}"
+        for idx, ((soc, loc, city), snip) in enumerate(zip(batch, snippets))
+    )
+
+    prompt = f"""
+    For each numbered society below, identify:
+    1. Every available BHK configuration (strictly from 1 to 5 BHK).
+    2. The 'Ticket Size' (Current market price/range in Cr or Lakhs).
+
+    {entries}
+
+    Output ONLY a JSON array of exactly {len(batch)} objects, one per society, in the same order:
+    [{{"bhk": "1, 2, 3 BHK", "price": "₹85 L - 1.5 Cr"}}, ...]
+    If no price is found for a society, use 'Market Rates'.
+    """
+
+    try:
+        response = model.generate_content(prompt, generation_config={'response_mime_type': 'application/json'})
+        try:
+            data = json.loads(response.text)
+        except ValueError:
+            # Clean JSON from markdown if Gemini adds it anyway
+            json_match = _RE_JSON_ARR.search(response.text)
+            data = json.loads(json_match.group()) if json_match else None
+        if isinstance(data, list) and len(data) == len(batch):
+            # Coerce to str — a stray list/number from the model would otherwise
+            # broadcast-fail when written into the frame's rows
+            return [(str(d.get('price', 'N/A')), str(d.get('bhk', 'N/A'))) for d in data]
+    except:
+        pass
+    return [("Market Rates", "1, 2, 3 BHK")] * len(batch)
 
 # --- SIDEBAR CONTROLS ---
 with st.sidebar:
@@ -119,6 +305,8 @@ with st.sidebar:
     gemini_api_key = st.text_input("Gemini API Key", type="password", help="Get at aistudio.google.com")
     st.header("📍 Project Location")
     project_url = st.text_input("Project Google Maps Link")
+    exact_roads = st.checkbox("Exact road distances (OSRM, slower)", value=False,
+                              help="Unchecked: instant great-circle estimate with a road multiplier.")
     st.divider()
     run_button = st.button("Generate Dashboard", use_container_width=True)
 
@@ -129,60 +317,181 @@ if uploaded_file and run_button:
     if not gemini_api_key or not project_url:
         st.error("Please provide both the Gemini API Key and Project Link in the sidebar.")
     else:
-        # Load File
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
-            
+        # Load File (cached on content, so reruns skip the re-parse)
+        file_bytes = uploaded_file.getvalue()
+        df = load_df(file_bytes, uploaded_file.name)
+
+        # Same file + same project + same distance mode = same report; reuse the
+        # one from session state instead of re-running the whole pipeline
+        run_key = (hashlib.sha256(file_bytes).hexdigest(), project_url, exact_roads)
+
         # Extract Project Coords
         project_coords = extract_coords_from_url(project_url)
-        
-        if not project_coords:
+
+        if st.session_state.get('results_key') == run_key:
+            st.success("Showing cached results for this file and project.")
+        elif not project_coords:
             st.error("Could not extract coordinates from the Google Maps link. Try copying it again.")
         else:
             st.success(f"Project Location Locked. Processing {len(df)} rows...")
             
-            results = []
             progress_bar = st.progress(0)
             status_text = st.empty()
-            
-            for i, row in df.iterrows():
-                soc = str(row.get('society', ''))
-                loc = str(row.get('locality', ''))
-                city = str(row.get('city', 'Pune'))
-                
-                status_text.text(f"Analyzing ({i+1}/{len(df)}): {soc}")
-                
-                # 1. Road Distance (Car)
-                soc_coords = get_coordinates(soc, loc, city)
-                dist_str = "Not Found"
-                if soc_coords:
-                    d_val = get_car_distance(project_coords, soc_coords)
-                    dist_str = f"{d_val} km" if d_val != "N/A" else "N/A"
-                
-                # 2. Market Data (AI)
-                price, bhks = fetch_market_ai(soc, loc, city, gemini_api_key)
-                
-                results.append({
-                    "Distance from project": dist_str,
-                    "Ticket Size": price,
-                    "Configurations": bhks
-                })
-                
-                progress_bar.progress((i + 1) / len(df))
-            
-            # Combine Data
-            results_df = pd.DataFrame(results)
-            final_df = pd.concat([df.reset_index(drop=True), results_df], axis=1)
-            
-            # Show Results
-            st.subheader("Final Processed Data")
-            st.dataframe(final_df)
-            
-            # Download Button
-            csv_output = final_df.to_csv(index=False).encode('utf-8')
-            st.download_button("Download Updated File", csv_output, "Project_Analysis.csv", "text/csv")
 
+            # 1+2. Geocode + Market Data (AI) — deduplicate first so each distinct
+            # (society, locality, city) pays for geocoding and Gemini exactly once,
+            # then fan the unique keys out to worker threads.
+            # Pull the key columns out as flat arrays instead of iterrows() —
+            # no per-row Series boxing, just plain Python tuples.
+            socs = df.get('society', pd.Series('', index=df.index)).astype(str).to_numpy()
+            locs = df.get('locality', pd.Series('', index=df.index)).astype(str).to_numpy()
+            cities = df.get('city', pd.Series('Pune', index=df.index)).astype(str).to_numpy()
+            keys = list(zip(socs, locs, cities))
+            uniq = list(dict.fromkeys(keys))
+
+            # Keys without a usable society name skip geocoding, search and Gemini
+            live = [k for k in uniq if k[0].strip() and k[0].strip().lower() != 'nan']
+
+            # Consult the Gemini cache up front: societies answered in a previous
+            # run keep their cached (price, bhk) and skip the snippet search —
+            # the slowest per-key network step — entirely.
+            market_by_key = {k: ("N/A", "N/A") for k in uniq}
+            cached_keys, pending = [], []
+            with shelve.open('.gemini_cache') as mcache:
+                for k in live:
+                    cached = mcache.get('|'.join(k))
+                    if cached is not None:
+                        market_by_key[k] = tuple(cached)
+                        cached_keys.append(k)
+                    else:
+                        pending.append(k)
+            pending_set = set(pending)
+
+            coords_by_key = {k: None for k in uniq}
+            snippets_by_key = {k: "" for k in uniq}
+            done = 0
+            # Each progress/status call re-renders over the websocket; cap the
+            # updates at ~100 regardless of how many societies are in flight
+            step = max(1, len(live) // 100)
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                futures = [pool.submit(process_key, key, key in pending_set) for key in live]
+                for fut in as_completed(futures):
+                    key, coords, snippets = fut.result()
+                    coords_by_key[key] = coords
+                    snippets_by_key[key] = snippets
+                    done += 1
+                    if done % step == 0 or done == len(live):
+                        status_text.text(f"Located {done}/{len(live)} unique societies")
+                        progress_bar.progress(done / len(live))
+
+            # 3. Road Distances (Car) — vectorized estimate by default, one OSRM
+            # /table round-trip only when exact distances are requested
+            status_text.text("Calculating road distances...")
+            coords_list = [coords_by_key[k] for k in keys]
+            if exact_roads:
+                # Query OSRM on unique society coords and map distances back to
+                # rows, same dedupe-before-API shape as the rest of the pipeline
+                uniq_dists = get_osrm_table(project_coords, [coords_by_key[k] for k in uniq])
+                dist_by_key = dict(zip(uniq, uniq_dists))
+                dist_vals = [dist_by_key[k] for k in keys]
+            else:
+                dist_vals = estimate_road_distances(project_coords, coords_list)
+
+            dist_strs = []
+            for soc_coords, d_val in zip(coords_list, dist_vals):
+                if d_val is not None:
+                    dist_strs.append(f"{d_val} km")
+                else:
+                    dist_strs.append("N/A" if soc_coords else "Not Found")
+
+            # Preallocate the output columns in place and stream market data into
+            # them as each Gemini batch lands — the preview fills in live and no
+            # separate results frame is ever buffered.
+            final_df = df
+            final_df['Distance from project'] = dist_strs
+            final_df['Ticket Size'] = "N/A"
+            final_df['Configurations'] = "N/A"
+
+            rows_by_key = {}
+            for pos, k in enumerate(keys):
+                rows_by_key.setdefault(k, []).append(pos)
+            price_col = final_df.columns.get_loc('Ticket Size')
+            bhk_col = final_df.columns.get_loc('Configurations')
+
+            def fill_rows(done_keys):
+                for k in done_keys:
+                    price, bhks = market_by_key[k]
+                    final_df.iloc[rows_by_key[k], price_col] = price
+                    final_df.iloc[rows_by_key[k], bhk_col] = bhks
+
+            preview = st.empty()
+
+            # 4. One Gemini call per batch of societies instead of one per row.
+            # Answers persist on disk keyed by society|locality|city, so re-runs
+            # and overlapping uploads skip the model entirely for known societies.
+            status_text.text("Fetching market data from Gemini...")
+            fill_rows(cached_keys)
+            preview.dataframe(final_df.head(PAGE_SIZE))
+            with shelve.open('.gemini_cache') as mcache:
+                for start in range(0, len(pending), GEMINI_BATCH_SIZE):
+                    batch = pending[start:start + GEMINI_BATCH_SIZE]
+                    answers = fetch_market_ai_batch(batch, [snippets_by_key[k] for k in batch], gemini_api_key)
+                    for k, ans in zip(batch, answers):
+                        market_by_key[k] = ans
+                        # Don't persist the parse-failure default — retry next run
+                        if ans != ("Market Rates", "1, 2, 3 BHK"):
+                            mcache['|'.join(k)] = ans
+                    fill_rows(batch)
+                    preview.dataframe(final_df.head(PAGE_SIZE))
+                    progress_bar.progress((start + len(batch)) / len(pending))
+
+            # Hand the finished report to session state — the display/download
+            # block below owns rendering from here on
+            preview.empty()
+            st.session_state['results_df'] = final_df
+            st.session_state['results_key'] = run_key
+
+if 'results_df' in st.session_state:
+    final_df = st.session_state['results_df']
+
+    # Show Results — paginate so only one page is Arrow-serialized per rerun
+    st.subheader("Final Processed Data")
+    if len(final_df) > PAGE_SIZE:
+        pages = (len(final_df) - 1) // PAGE_SIZE + 1
+        page = st.number_input(f"Page (of {pages})", 1, pages, 1)
+        st.dataframe(final_df.iloc[(page - 1) * PAGE_SIZE : page * PAGE_SIZE])
+    else:
+        st.dataframe(final_df)
+
+    # Download Buttons — hand the BytesIO objects to Streamlit as-is (it reads
+    # them itself), skipping the full getvalue() copy of each buffer. Clicking
+    # one triggers a rerun, which lands in this branch via the cached results
+    # instead of re-running the pipeline.
+    csv_buf = io.BytesIO()
+    final_df.to_csv(csv_buf, index=False)
+    csv_buf.seek(0)
+    st.download_button("Download Updated File", csv_buf, "Project_Analysis.csv", "text/csv")
+
+    # Mixed-type object columns from messy uploads can make pyarrow refuse the
+    # frame — the Parquet button is a bonus, so just hide it rather than let
+    # ArrowInvalid take down the whole results view
+    try:
+        pq_buf = io.BytesIO()
+        final_df.to_parquet(pq_buf, compression='zstd')
+        pq_buf.seek(0)
+    except Exception:
+        pq_buf = None
+    if pq_buf is not None:
+        st.download_button("Download Parquet", pq_buf, "Project_Analysis.parquet", "application/octet-stream")
+
+    # Big reports: stream the CSV straight into a deflated zip entry —
+    # to_csv writes through the zip member, never a second full string
+    if len(final_df) > 2000:
+        zip_buf = io.BytesIO()
+        with zipfile.ZipFile(zip_buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            with zf.open('Project_Analysis.csv', 'w') as fh:
+                final_df.to_csv(fh, index=False)
+        zip_buf.seek(0)
+        st.download_button("Download Zipped CSV", zip_buf, "Project_Analysis.zip", "application/zip")
 elif not run_button:
     st.info("👈 Enter your details in the sidebar and click Generate.")